@@ -198,6 +198,164 @@ def inject_user_and_cart():
     return {"current_user": current_user, "cart_count": count}
 
 
+# ====== 新增：密碼雜湊工作池與登入節流 ======
+# scrypt 每次要吃掉數十毫秒 CPU；交給有上限的工作池執行，
+# 超過容量就直接回「系統忙碌」，避免登入尖峰或撞庫把前台頁面一起拖垮。
+# 搭配 gunicorn.conf.py 的 gthread worker：執行緒數 > 雜湊名額，其餘執行緒永遠留給前台頁面。
+# 注意：工作池與節流計數都在單一 gunicorn worker 行程內，多個 worker 各自計算。
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from werkzeug.middleware.proxy_fix import ProxyFix
+import threading
+import time
+
+# 只信任設定層數的反向代理（Render 上預設 1）；為 0 時不讀 X-Forwarded-For，避免被偽造繞過 IP 節流
+if app.config["TRUSTED_PROXY_HOPS"]:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXY_HOPS"])
+elif os.environ.get("DATABASE_URL"):
+    app.logger.warning("TRUSTED_PROXY_HOPS=0：若部署在反向代理後面，所有訪客會共用代理的 IP 節流計數，"
+                       "請設定 TRUSTED_PROXY_HOPS")
+
+class HashBusy(Exception):
+    """工作池已滿或排隊逾時"""
+
+_hash_pool = ThreadPoolExecutor(max_workers=app.config["PASSWORD_HASH_WORKERS"],
+                                thread_name_prefix="pwhash")
+_hash_inflight = 0                  # 執行中 + 排隊中的雜湊數
+_hash_inflight_lock = threading.Lock()
+
+def _release_hash_slot(_future=None):
+    global _hash_inflight
+    with _hash_inflight_lock:
+        _hash_inflight -= 1
+
+def _run_hash(fn, *args, low_priority=False):
+    # low_priority：只在有空閒的 worker 時才執行，不排隊（給已超過 IP 節流的請求）
+    global _hash_inflight
+    capacity = app.config["PASSWORD_HASH_WORKERS"]
+    if not low_priority:
+        capacity += app.config["PASSWORD_HASH_QUEUE"]
+    with _hash_inflight_lock:
+        if _hash_inflight >= capacity:
+            raise HashBusy()
+        _hash_inflight += 1
+
+    started = threading.Event()
+    def job():
+        started.set()
+        return fn(*args)
+
+    try:
+        future = _hash_pool.submit(job)
+    except Exception:
+        _release_hash_slot()
+        raise
+    future.add_done_callback(_release_hash_slot)
+    # 逾時只算排隊時間；已開始的雜湊一定跑完並使用結果，不浪費已花掉的 CPU
+    if not started.wait(app.config["PASSWORD_HASH_TIMEOUT"]) and future.cancel():
+        raise HashBusy()
+    return future.result()
+
+def hash_password(pw: str, low_priority=False) -> str:
+    return _run_hash(generate_password_hash, pw, app.config["PASSWORD_HASH_METHOD"],
+                     low_priority=low_priority)
+
+def verify_password(pw_hash: str, pw: str, low_priority=False) -> bool:
+    return _run_hash(check_password_hash, pw_hash, pw, low_priority=low_priority)
+
+# 以設定的 method 實際產生一次雜湊，取得 werkzeug 正規化後的參數字串（例如補上預設成本）
+# werkzeug 雜湊格式為 "method$salt$hash"，第一個 $ 之前就是演算法與成本參數
+_current_hash_params = generate_password_hash("", app.config["PASSWORD_HASH_METHOD"]).split("$", 1)[0]
+
+def password_needs_rehash(pw_hash: str) -> bool:
+    return pw_hash.split("$", 1)[0] != _current_hash_params
+
+# 次數節流：key -> 時間戳記 deque（滑動時間窗）
+#   acct:{email}  已存在帳號的登入失敗（硬上限：達上限直接拒絕）
+#   ip:{ip}       同一 IP 的登入失敗（軟上限：超過後雜湊改為低優先，不拒絕正確密碼）
+#   reg:{ip}      同一 IP 的註冊次數（軟上限，同上）
+# 檢查與登記在同一把鎖內完成（先預約名額），並行請求也無法超過上限
+_attempts = {}
+_attempts_lock = threading.Lock()
+_attempts_swept_at = 0.0
+
+def _client_ip() -> str:
+    return request.remote_addr or ""
+
+def _prune_attempts(key, now):
+    q = _attempts.get(key)
+    if q is None:
+        return 0
+    window = app.config["LOGIN_WINDOW_SECONDS"]
+    while q and now - q[0] > window:
+        q.popleft()
+    if not q:
+        del _attempts[key]
+        return 0
+    return len(q)
+
+def _sweep_attempts(now):
+    # 清掉過期的 key；撞庫常換 email / IP，只靠「同一 key 再被檢查」才清理會無限成長
+    global _attempts_swept_at
+    for key in list(_attempts):
+        _prune_attempts(key, now)
+    _attempts_swept_at = now
+
+def _make_room_for_key(now):
+    """要新增 key 前確保表內有空位；只淘汰 ip: / reg:，不丟掉帳號鎖定計數。沒位置回傳 False"""
+    if len(_attempts) < app.config["THROTTLE_MAX_KEYS"]:
+        return True
+    if now - _attempts_swept_at >= 1:
+        _sweep_attempts(now)
+        if len(_attempts) < app.config["THROTTLE_MAX_KEYS"]:
+            return True
+    victim = next((k for k in _attempts if not k.startswith("acct:")), None)
+    if victim is None:
+        return False
+    del _attempts[victim]
+    return True
+
+def reserve_attempt(limits, soft_limits=()):
+    """
+    limits / soft_limits: [(key, 上限), ...]，全部登記一次。
+    回傳 (token, soft_exceeded)：任一硬上限 key 已滿時 token 為 None（不登記）；
+    軟上限 key 已滿時 soft_exceeded 為 True，但仍登記、不拒絕。
+    """
+    now = time.monotonic()
+    with _attempts_lock:
+        if now - _attempts_swept_at >= app.config["LOGIN_WINDOW_SECONDS"]:
+            _sweep_attempts(now)
+        if any(_prune_attempts(key, now) >= limit for key, limit in limits):
+            return None, False
+        soft_exceeded = any(_prune_attempts(key, now) >= limit for key, limit in soft_limits)
+        for key, limit in list(limits) + list(soft_limits):
+            if key not in _attempts:
+                if not _make_room_for_key(now):
+                    continue
+                # 軟上限 key 只需保留最近 limit 筆，持續被打也不會無限變長
+                _attempts[key] = deque(maxlen=limit if (key, limit) in soft_limits else None)
+            _attempts[key].append(now)
+        return now, soft_exceeded
+
+def release_attempt(keys, token):
+    """撤銷 reserve_attempt 登記的那一次（例如登入成功、系統忙碌）"""
+    with _attempts_lock:
+        for key in keys:
+            q = _attempts.get(key)
+            if not q:
+                continue
+            try:
+                q.remove(token)
+            except ValueError:
+                pass
+            if not q:
+                del _attempts[key]
+
+def clear_attempts(key):
+    with _attempts_lock:
+        _attempts.pop(key, None)
+
+
 # ====== 新增：會員相關路由 ======
 @app.route("/register", methods=["GET", "POST"])
 def register():
@@ -212,7 +370,15 @@ def register():
         try:
             if db.query(User).filter_by(email=email).first():
                 flash("這個 Email 已註冊", "error"); return redirect(url_for("register"))
-            u = User(email=email, name=name, password_hash=generate_password_hash(pw))
+            # 同一 IP 的註冊次數另外計算；超過上限只降為低優先雜湊，避免大量註冊佔滿工作池
+            reg_key = f"reg:{_client_ip()}"
+            token, throttled = reserve_attempt([], [(reg_key, app.config["REGISTER_MAX_PER_IP"])])
+            try:
+                pw_hash = hash_password(pw, low_priority=throttled)
+            except HashBusy:
+                release_attempt([reg_key], token)
+                flash("系統忙碌，請稍後再試", "error"); return redirect(url_for("register"))
+            u = User(email=email, name=name, password_hash=pw_hash)
             db.add(u); db.commit()
             flash("註冊成功，請登入", "success")
             return redirect(url_for("login"))
@@ -228,8 +394,31 @@ def login():
         db = SessionLocal()
         try:
             u = db.query(User).filter_by(email=email).first()
-            if not u or not check_password_hash(u.password_hash, pw):
+            # 先預約一次失敗名額；帳號 key 只記已存在的 email，避免亂填的 email 塞滿記憶體。
+            # 帳號是硬上限；IP 是軟上限（同一代理 / NAT 後的正常使用者仍可用正確密碼登入，只是不能排隊）
+            limits = [(f"acct:{email}", app.config["LOGIN_MAX_FAILS_PER_ACCOUNT"])] if u else []
+            soft_limits = [(f"ip:{_client_ip()}", app.config["LOGIN_MAX_FAILS_PER_IP"])]
+            keys = [k for k, _ in limits + soft_limits]
+            token, throttled = reserve_attempt(limits, soft_limits)
+            if token is None:
+                flash("嘗試次數過多，請稍後再試", "error"); return redirect(url_for("login"))
+            try:
+                ok = bool(u) and verify_password(u.password_hash, pw, low_priority=throttled)
+            except HashBusy:
+                release_attempt(keys, token)
+                flash("系統忙碌，請稍後再試", "error"); return redirect(url_for("login"))
+            if not ok:
                 flash("帳號或密碼錯誤", "error"); return redirect(url_for("login"))
+            release_attempt(keys, token)
+            clear_attempts(f"acct:{email}")
+
+            # 舊參數的雜湊：趁有明文密碼時升級成目前設定（忙碌時略過，下次再升級）
+            if password_needs_rehash(u.password_hash):
+                try:
+                    u.password_hash = hash_password(pw, low_priority=True)
+                    db.commit()
+                except HashBusy:
+                    pass
 
             login_user(u)   # 成功登入
             flash("登入成功", "success")
@@ -4,3 +4,20 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
     ADMIN_PASSWORD = os.environ.get("FLASK_ADMIN_PW", "changeme")
     CONTENT_DIR = os.path.join(os.path.dirname(__file__), "content")
+    # 密碼雜湊：演算法與成本參數（werkzeug 格式，例如 "scrypt:32768:8:1"、"pbkdf2:sha256:600000"）
+    # 修改後，舊參數的雜湊會在使用者下次登入成功時自動重新雜湊
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # 雜湊工作池：同時最多幾個雜湊在跑、最多幾個在排隊、排隊等待秒數上限（超過就回「系統忙碌」）
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", "2"))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", "0.5"))
+    # gunicorn gthread 每個 worker 額外保留給前台頁面的執行緒數（見 gunicorn.conf.py）
+    STOREFRONT_THREADS = int(os.environ.get("STOREFRONT_THREADS", "4"))
+    # 前面有幾層可信任的反向代理；Render（會設定 RENDER 環境變數）預設 1，其他預設 0 = 直接使用連線來源 IP
+    TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", "1" if os.environ.get("RENDER") else "0"))
+    # 節流：時間窗內同一帳號 / 同一 IP 的登入失敗上限、同一 IP 的註冊上限
+    LOGIN_WINDOW_SECONDS = int(os.environ.get("LOGIN_WINDOW_SECONDS", "300"))
+    LOGIN_MAX_FAILS_PER_ACCOUNT = int(os.environ.get("LOGIN_MAX_FAILS_PER_ACCOUNT", "5"))
+    LOGIN_MAX_FAILS_PER_IP = int(os.environ.get("LOGIN_MAX_FAILS_PER_IP", "20"))
+    REGISTER_MAX_PER_IP = int(os.environ.get("REGISTER_MAX_PER_IP", "10"))
+    THROTTLE_MAX_KEYS = int(os.environ.get("THROTTLE_MAX_KEYS", "10000"))
@@ -0,0 +1,9 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from config import Config
+
+# 使用 gthread：每個 worker 行程內有多個執行緒，
+# 執行緒數嚴格大於「雜湊工作池 + 排隊」名額，登入尖峰時仍保留 STOREFRONT_THREADS 個執行緒服務前台頁面
+worker_class = "gthread"
+threads = Config.PASSWORD_HASH_WORKERS + Config.PASSWORD_HASH_QUEUE + max(1, Config.STOREFRONT_THREADS)
@@ -0,0 +1,7 @@
+import os, sys
+
+# 測試用記憶體 SQLite 與低成本雜湊，必須在 import app 之前設定；
+# 直接覆寫，避免 shell 裡的 DATABASE_URL 讓測試寫進正式資料庫
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
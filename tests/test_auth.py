@@ -0,0 +1,230 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from werkzeug.security import generate_password_hash, check_password_hash
+
+import app as shop
+
+
+@pytest.fixture(autouse=True)
+def reset_throttle(monkeypatch):
+    shop._attempts.clear()
+    monkeypatch.setattr(shop, "_attempts_swept_at", 0.0)
+    monkeypatch.setitem(shop.app.config, "PASSWORD_HASH_TIMEOUT", 5)
+    yield
+    shop._attempts.clear()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(shop.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def client():
+    shop.app.config["TESTING"] = True
+    return shop.app.test_client()
+
+
+@pytest.fixture
+def pool_full(monkeypatch):
+    monkeypatch.setattr(shop, "_hash_inflight",
+                        shop.app.config["PASSWORD_HASH_WORKERS"] + shop.app.config["PASSWORD_HASH_QUEUE"])
+
+
+def _last_flash(client):
+    with client.session_transaction() as s:
+        flashes = s.get("_flashes", [])
+    return flashes[-1][1] if flashes else None
+
+
+def _make_user(email, pw, method=None):
+    db = shop.SessionLocal()
+    try:
+        pw_hash = generate_password_hash(pw, method or shop.app.config["PASSWORD_HASH_METHOD"])
+        db.add(shop.User(email=email, name="test", password_hash=pw_hash))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _stored_hash(email):
+    db = shop.SessionLocal()
+    try:
+        return db.query(shop.User).filter_by(email=email).first().password_hash
+    finally:
+        db.close()
+
+
+# ---------- 節流 ----------
+def test_reserve_attempt_stops_at_limit(clock):
+    limits = [("acct:a@example.com", 3)]
+    assert all(shop.reserve_attempt(limits)[0] is not None for _ in range(3))
+    assert shop.reserve_attempt(limits) == (None, False)
+
+
+def test_reserve_attempt_window_expires(clock):
+    limits = [("acct:w@example.com", 2)]
+    shop.reserve_attempt(limits); shop.reserve_attempt(limits)
+    assert shop.reserve_attempt(limits)[0] is None
+    clock[0] += shop.app.config["LOGIN_WINDOW_SECONDS"] + 1
+    assert shop.reserve_attempt(limits)[0] is not None
+
+
+def test_soft_limit_reports_but_does_not_refuse(clock):
+    soft = [("ip:1.2.3.4", 2)]
+    assert shop.reserve_attempt([], soft)[1] is False
+    assert shop.reserve_attempt([], soft)[1] is False
+    token, throttled = shop.reserve_attempt([], soft)
+    assert token is not None and throttled
+    assert len(shop._attempts["ip:1.2.3.4"]) == 2
+
+
+def test_release_attempt_frees_slot(clock):
+    limits = [("acct:b@example.com", 1)]
+    token, _ = shop.reserve_attempt(limits)
+    assert shop.reserve_attempt(limits)[0] is None
+    shop.release_attempt(["acct:b@example.com"], token)
+    assert shop.reserve_attempt(limits)[0] is not None
+
+
+def test_reserve_attempt_is_atomic_under_concurrency():
+    limits = [("acct:c@example.com", 5)]
+    results = []
+    start = threading.Barrier(20)
+
+    def worker():
+        start.wait()
+        results.append(shop.reserve_attempt(limits)[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert sum(r is not None for r in results) == 5
+
+
+def test_sweep_drops_expired_keys(clock):
+    for i in range(50):
+        shop.reserve_attempt([], [(f"ip:10.0.0.{i}", 5)])
+    clock[0] += shop.app.config["LOGIN_WINDOW_SECONDS"] + 1
+    shop.reserve_attempt([], [("ip:10.0.1.1", 5)])
+    assert list(shop._attempts) == ["ip:10.0.1.1"]
+
+
+def test_sweep_caps_key_count(clock, monkeypatch):
+    monkeypatch.setitem(shop.app.config, "THROTTLE_MAX_KEYS", 10)
+    for i in range(30):
+        shop.reserve_attempt([], [(f"ip:10.0.0.{i}", 5)])
+    assert len(shop._attempts) <= 10
+
+
+def test_full_table_keeps_account_lockouts(clock, monkeypatch):
+    monkeypatch.setitem(shop.app.config, "THROTTLE_MAX_KEYS", 5)
+    shop.reserve_attempt([("acct:victim@example.com", 5)])
+    for i in range(30):
+        shop.reserve_attempt([], [(f"ip:10.0.0.{i}", 5)])
+    assert "acct:victim@example.com" in shop._attempts
+
+
+def test_existing_key_does_not_evict(clock, monkeypatch):
+    monkeypatch.setitem(shop.app.config, "THROTTLE_MAX_KEYS", 3)
+    for i in range(3):
+        shop.reserve_attempt([], [(f"ip:10.0.0.{i}", 5)])
+    shop.reserve_attempt([], [("ip:10.0.0.2", 5)])
+    assert list(shop._attempts) == ["ip:10.0.0.0", "ip:10.0.0.1", "ip:10.0.0.2"]
+
+
+def test_login_locks_account_after_failures(client):
+    _make_user("lock@example.com", "right-pw")
+    limit = shop.app.config["LOGIN_MAX_FAILS_PER_ACCOUNT"]
+    for _ in range(limit):
+        client.post("/login", data={"email": "lock@example.com", "password": "wrong"})
+        assert _last_flash(client) == "帳號或密碼錯誤"
+    client.post("/login", data={"email": "lock@example.com", "password": "right-pw"})
+    assert _last_flash(client) == "嘗試次數過多，請稍後再試"
+
+
+def test_ip_limit_still_accepts_correct_password(client, monkeypatch):
+    _make_user("shared-ip@example.com", "pw")
+    monkeypatch.setitem(shop.app.config, "LOGIN_MAX_FAILS_PER_IP", 2)
+    for i in range(3):
+        client.post("/login", data={"email": f"stranger{i}@example.com", "password": "x"})
+    client.post("/login", data={"email": "shared-ip@example.com", "password": "pw"})
+    assert _last_flash(client) == "登入成功"
+
+
+def test_unknown_email_not_tracked_per_account(client):
+    client.post("/login", data={"email": "nobody@example.com", "password": "x"})
+    assert not any(k.startswith("acct:") for k in shop._attempts)
+
+
+def test_signups_do_not_count_as_login_failures(client):
+    for i in range(3):
+        client.post("/register", data={"email": f"signup{i}@example.com", "name": "n", "password": "pw"})
+    assert not any(k.startswith("ip:") for k in shop._attempts)
+    assert any(k.startswith("reg:") for k in shop._attempts)
+
+
+# ---------- 工作池 ----------
+def test_hash_busy_when_slots_exhausted(pool_full):
+    with pytest.raises(shop.HashBusy):
+        shop.hash_password("pw")
+
+
+def test_low_priority_does_not_queue(monkeypatch):
+    monkeypatch.setattr(shop, "_hash_inflight", shop.app.config["PASSWORD_HASH_WORKERS"])
+    with pytest.raises(shop.HashBusy):
+        shop.hash_password("pw", low_priority=True)
+
+
+def test_queue_timeout_raises_busy_and_cancels_job(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(shop, "_hash_pool", pool)
+    monkeypatch.setitem(shop.app.config, "PASSWORD_HASH_TIMEOUT", 0.05)
+    gate = threading.Event()
+    blocker = pool.submit(gate.wait)
+    ran = []
+    try:
+        with pytest.raises(shop.HashBusy):
+            shop._run_hash(ran.append, "queued")
+    finally:
+        gate.set()
+        blocker.result()
+        pool.shutdown(wait=True)
+    assert ran == []
+    assert shop._hash_inflight == 0
+
+
+def test_started_hash_is_not_timed_out(monkeypatch):
+    monkeypatch.setitem(shop.app.config, "PASSWORD_HASH_TIMEOUT", 0.01)
+
+    def slow(x):
+        threading.Event().wait(0.1)
+        return x
+
+    assert shop._run_hash(slow, "done") == "done"
+
+
+def test_login_busy_releases_reservation(client, pool_full):
+    _make_user("busy@example.com", "pw")
+    client.post("/login", data={"email": "busy@example.com", "password": "pw"})
+    assert _last_flash(client) == "系統忙碌，請稍後再試"
+    assert not shop._attempts
+
+
+# ---------- 重新雜湊 ----------
+def test_password_needs_rehash():
+    assert shop.password_needs_rehash(generate_password_hash("pw", "pbkdf2:sha256:500"))
+    assert not shop.password_needs_rehash(shop.hash_password("pw"))
+
+
+def test_login_rehashes_old_parameters(client):
+    _make_user("old@example.com", "pw", method="pbkdf2:sha256:500")
+    client.post("/login", data={"email": "old@example.com", "password": "pw"})
+    assert _last_flash(client) == "登入成功"
+    new_hash = _stored_hash("old@example.com")
+    assert not shop.password_needs_rehash(new_hash)
+    assert check_password_hash(new_hash, "pw")